@@ -1,69 +1,140 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime
+import importlib.util
 import os
-import findspark
-# This line helps PySpark find the Spark installation automatically if it's not in PATH
-# It's good practice for local development.
-findspark.init()
-
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, sum, avg, count, date_format
+import re
+import shutil
 
 # --- Configuration ---
 NUM_SAMPLES = 5_000_000 # Number of records for the synthetic dataset
-DATA_FILENAME = 'large_synthetic_data.csv'
+GENERATION_CHUNK_SIZE = 500_000 # Records generated and written to Parquet per chunk
+DATA_FILENAME = 'large_synthetic_data/' # Parquet dataset directory, Hive-partitioned by Region
 ANALYSIS_REPORT_FILENAME = 'analysis_report.txt'
 SPARK_DRIVER_MEMORY = "4g" # Memory allocated to Spark driver for local mode
+SPARK_SHUFFLE_PARTITIONS = "32" # Default of 200 over-partitions a single-node 5M-row job
+BACKEND = os.environ.get("BACKEND", "spark") # "spark", or "duckdb"/"polars" for single-node runs
+SUPPORTED_BACKENDS = ("spark", "duckdb", "polars")
+VERBOSE = False # Print schema, sample rows and row count after loading (each costs extra Spark work)
+
+# Explicit Parquet schema, so narrow column types (int32 IDs, DATE, float32) survive the pandas round trip
+PARQUET_SCHEMA = pa.schema([
+    ("TransactionID", pa.int32()),
+    ("Date", pa.date32()), # pandas widens datetime64[D] to datetime64[s], which would otherwise be written as a timestamp
+    ("CustomerID", pa.int32()),
+    ("Region", pa.dictionary(pa.int8(), pa.string())),
+    ("ProductCategory", pa.dictionary(pa.int8(), pa.string())),
+    ("UnitsSold", pa.int8()),
+    ("PricePerUnit", pa.float32()),
+    ("PaymentMethod", pa.dictionary(pa.int8(), pa.string())),
+    ("ShippingCost", pa.float32()),
+    ("TotalAmount", pa.float64()),
+    ("Profit", pa.float64()),
+    ("YearMonth", pa.int32()),
+])
+
+# Full-precision money values in the console and report, instead of pandas' 7-digit scientific notation
+_MONEY_FORMAT = '{:,.2f}'.format
+
+# Adds padding to every <th>/<td> of the report's HTML tables in a single pass
+_HTML_CELL = re.compile(r'<(th|td)>')
+_HTML_CELL_PADDED = r'<\1 style="padding: 5px;">'
 
 # --- Function 1: Generate Large Synthetic Data ---
-def generate_large_data(num_samples=NUM_SAMPLES, filename=DATA_FILENAME):
+def generate_large_data(num_samples=NUM_SAMPLES, filename=DATA_FILENAME, chunk_size=GENERATION_CHUNK_SIZE):
     """
-    Generates a large synthetic dataset simulating transactional data and saves it to a CSV file.
+    Generates a large synthetic dataset simulating transactional data and saves it as a
+    Parquet dataset partitioned by Region (one `Region=<name>/` subdirectory per region).
+
+    The data is generated and written in chunks of `chunk_size` rows, so peak memory stays
+    bounded by one chunk rather than the whole dataset.
 
     Args:
         num_samples (int): The number of transactional records to generate.
-        filename (str): The name of the CSV file to save the data to.
+        filename (str): The directory to save the Parquet dataset to. An existing dataset there is replaced;
+            a directory holding anything else raises ValueError.
+        chunk_size (int): The number of records generated and written per chunk.
     """
     print(f"--- Generating {num_samples:,} Synthetic Large Data Samples ---")
-    np.random.seed(42) # for reproducibility
+    rng = np.random.default_rng(42) # for reproducibility
 
-    # Generate Dates over a few years
     start_date = datetime(2020, 1, 1)
-    dates = [start_date + timedelta(days=np.random.randint(0, 1095)) for _ in range(num_samples)] # 3 years of data
-
-    # Generate other features
     regions = ['North', 'South', 'East', 'West', 'Central']
     product_categories = ['Electronics', 'Clothing', 'Home Goods', 'Books', 'Food', 'Software', 'Services']
     payment_methods = ['Credit Card', 'Debit Card', 'PayPal', 'Bank Transfer']
-    customer_ids = np.random.randint(10000, 99999, num_samples) # Simulate customer IDs
-
-    data = {
-        'TransactionID': np.arange(1, num_samples + 1),
-        'Date': dates,
-        'CustomerID': customer_ids,
-        'Region': np.random.choice(regions, num_samples),
-        'ProductCategory': np.random.choice(product_categories, num_samples),
-        'UnitsSold': np.random.randint(1, 10, num_samples),
-        'PricePerUnit': np.random.uniform(5, 1000, num_samples),
-        'PaymentMethod': np.random.choice(payment_methods, num_samples),
-        'ShippingCost': np.random.uniform(0, 25, num_samples)
-    }
-
-    df = pd.DataFrame(data)
-
-    # Calculate TotalAmount and Profit
-    df['TotalAmount'] = df['UnitsSold'] * df['PricePerUnit'] + df['ShippingCost']
-    df['Profit'] = df['TotalAmount'] * np.random.uniform(0.1, 0.4, num_samples) - np.random.uniform(0, 5, num_samples)
-    df['Profit'] = df['Profit'].apply(lambda x: max(0.5, x)) # Ensure profit is positive
-
-    # Format Date column
-    df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d') # Store as YYYY-MM-DD string
 
     print(f"Saving data to '{filename}'...")
-    df.to_csv(filename, index=False)
-    print(f"Synthetic data saved to '{filename}' (File size: {os.path.getsize(filename) / (1024*1024):.2f} MB)")
-    print("\nDataset head:\n", df.head())
+    if os.path.isdir(filename):
+        # Stale partitions from a previous run would otherwise be read as well. Only the dataset's own
+        # Region=* partitions are removed, and any other content makes us refuse rather than delete it.
+        entries = os.listdir(filename)
+        foreign = sorted(e for e in entries
+                         if not (e.startswith('Region=') and os.path.isdir(os.path.join(filename, e))))
+        if foreign:
+            raise ValueError(f"Refusing to overwrite '{filename}': it contains entries that are not "
+                             f"Region=* partitions of a generated dataset ({', '.join(foreign[:5])})")
+        for entry in entries:
+            shutil.rmtree(os.path.join(filename, entry))
+    head = None
+    for chunk_start in range(0, num_samples, chunk_size):
+        n = min(chunk_size, num_samples - chunk_start)
+
+        # Generate Dates over a few years
+        offsets = rng.integers(0, 1095, n, dtype=np.int32) # 3 years of data
+        dates = np.datetime64(start_date, 'D') + offsets.astype('timedelta64[D]') # Written as a Parquet DATE via PARQUET_SCHEMA
+
+        # Generate other features
+        customer_ids = rng.integers(10000, 99999, n, dtype=np.int32) # Simulate customer IDs
+
+        data = {
+            'TransactionID': np.arange(chunk_start + 1, chunk_start + n + 1, dtype=np.int32),
+            'Date': dates,
+            'CustomerID': customer_ids,
+            # Sample small integer codes and keep them as categoricals, which pyarrow writes
+            # as dictionary-encoded strings
+            'Region': pd.Categorical.from_codes(rng.integers(0, len(regions), n, dtype=np.int8), regions),
+            'ProductCategory': pd.Categorical.from_codes(rng.integers(0, len(product_categories), n, dtype=np.int8), product_categories),
+            # float32 halves the size of the per-unit columns; the aggregated amounts below stay float64
+            'UnitsSold': rng.integers(1, 10, n, dtype=np.int8),
+            'PricePerUnit': 5 + 995 * rng.random(n, dtype=np.float32),
+            'PaymentMethod': pd.Categorical.from_codes(rng.integers(0, len(payment_methods), n, dtype=np.int8), payment_methods),
+            'ShippingCost': 25 * rng.random(n, dtype=np.float32)
+        }
+
+        chunk = pd.DataFrame(data)
+
+        # Calculate TotalAmount and Profit
+        # Widen before the arithmetic so the float64 amount is exact for its float32 inputs
+        chunk['TotalAmount'] = chunk['UnitsSold'] * chunk['PricePerUnit'].astype(np.float64) + chunk['ShippingCost'].astype(np.float64)
+        # Draw both Profit noise terms in a single RNG call
+        u = rng.random((2, n), dtype=np.float32)
+        profit = chunk['TotalAmount'].to_numpy() * (0.1 + 0.3 * u[0]) - 5.0 * u[1]
+        np.maximum(profit, 0.5, out=profit) # Ensure profit is positive
+        chunk['Profit'] = profit
+
+        # Months since 1970-01 as int32, so the monthly trend groups on an integer key in Spark
+        chunk['YearMonth'] = dates.astype('datetime64[M]').astype(np.int32)
+
+        if head is None:
+            head = chunk.head()
+
+        # Snappy-compressed Parquet lets Spark decode only the columns each insight touches,
+        # and the Region partitions let it skip whole directories when filtering on Region
+        table = pa.Table.from_pandas(chunk, schema=PARQUET_SCHEMA, preserve_index=False)
+        pq.write_to_dataset(
+            table, root_path=filename, partition_cols=['Region'], compression='snappy',
+            # Without min_rows_per_group the dataset writer flushes every input batch after
+            # splitting it by Region, leaving many tiny row groups per file
+            min_rows_per_group=256_000, row_group_size=256_000,
+            basename_template=f"part-{chunk_start // chunk_size:05d}-{{i}}.parquet"
+        )
+        del chunk, table
+
+    dataset_size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(filename) for name in names)
+    print(f"Synthetic data saved to '{filename}' (Dataset size: {dataset_size / (1024*1024):.2f} MB)")
+    print("\nDataset head:\n", head)
     # For very large dataframes, df.info() and df.describe() can be slow,
     # showing head is usually sufficient for quick check.
     # df.info(verbose=False, show_counts=False)
@@ -74,24 +145,77 @@ def analyze_big_data(data_filename=DATA_FILENAME, report_filename=ANALYSIS_REPOR
     """
     Initializes Spark, loads data, performs analysis, and saves insights to a report.
     """
+    # Spark is imported here rather than at module level, so the single-node backends run without it
+    if importlib.util.find_spec("pyspark") is None:
+        # findspark locates a Spark installation that is not on the Python path.
+        # Only fall back to it when pyspark isn't importable, since the search is slow on cold start.
+        import findspark
+        findspark.init()
+    from pyspark import StorageLevel
+    from pyspark.sql import SparkSession
+    from pyspark.sql.functions import col, format_string, month, year
+    from pyspark.sql.types import StructType, StructField, IntegerType, DoubleType, StringType, DateType
+
     # --- 2. Initialize Spark Session ---
     print("--- Initializing Spark Session ---")
     spark = SparkSession.builder \
         .appName("BigDataAnalysisPipeline") \
         .config("spark.driver.memory", SPARK_DRIVER_MEMORY) \
+        .config("spark.sql.adaptive.enabled", "true") \
+        .config("spark.sql.adaptive.coalescePartitions.enabled", "true") \
+        .config("spark.sql.adaptive.skewJoin.enabled", "true") \
+        .config("spark.sql.adaptive.advisoryPartitionSizeInBytes", "16m") \
+        .config("spark.sql.shuffle.partitions", SPARK_SHUFFLE_PARTITIONS) \
+        .config("spark.sql.autoBroadcastJoinThreshold", "32m") \
+        .config("spark.sql.parquet.enableVectorizedReader", "true") \
+        .config("spark.sql.parquet.columnarReaderBatchSize", "8192") \
+        .config("spark.sql.parquet.filterPushdown", "true") \
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true") \
+        .config("spark.sql.execution.arrow.pyspark.fallback.enabled", "true") \
         .getOrCreate()
     print("Spark Session initialized successfully.")
 
     # --- 3. Load Data ---
     print(f"\n--- Loading Data from {data_filename} into Spark DataFrame ---")
     try:
-        df_spark = spark.read.csv(data_filename, header=True, inferSchema=True)
+        if data_filename.endswith('.csv'):
+            # Explicit schema for CSV input, so Spark does not need an extra inference pass over the file
+            transaction_schema = StructType([
+                StructField("TransactionID", IntegerType()),
+                StructField("Date", DateType()),
+                StructField("CustomerID", IntegerType()),
+                StructField("Region", StringType()),
+                StructField("ProductCategory", StringType()),
+                StructField("UnitsSold", IntegerType()),
+                StructField("PricePerUnit", DoubleType()),
+                StructField("PaymentMethod", StringType()),
+                StructField("ShippingCost", DoubleType()),
+                StructField("TotalAmount", DoubleType()),
+                StructField("Profit", DoubleType()),
+            ])
+            df_spark = spark.read.schema(transaction_schema) \
+                .option("header", "true") \
+                .option("dateFormat", "yyyy-MM-dd") \
+                .csv(data_filename) \
+                .withColumn("YearMonth", ((year(col("Date")) - 1970) * 12 + month(col("Date")) - 1).cast("int"))
+        else:
+            df_spark = spark.read.parquet(data_filename)
+        # Keep only the columns the insights use, so the reader decodes nothing else
+        df_spark = df_spark.select(
+            'Region', 'ProductCategory', 'PaymentMethod', 'CustomerID',
+            'TransactionID', 'YearMonth', 'TotalAmount', 'Profit'
+        )
         print("Data loaded into Spark DataFrame successfully.")
-        print("Spark DataFrame Schema:")
-        df_spark.printSchema()
-        print("First 5 rows of Spark DataFrame:")
-        df_spark.show(5)
-        print(f"Total rows in Spark DataFrame: {df_spark.count():,}")
+        if VERBOSE:
+            # The insights read the input once, so caching only pays off for the extra actions below
+            df_spark = df_spark.persist(StorageLevel.MEMORY_AND_DISK)
+            print("Spark DataFrame Schema:")
+            df_spark.printSchema()
+            print("First 5 rows of Spark DataFrame:")
+            df_spark.show(5)
+            print(f"Total rows in Spark DataFrame: {df_spark.count():,}") # Also materializes the cache
+        else:
+            print(f"Input partitions: {df_spark.rdd.getNumPartitions()}")
     except Exception as e:
         print(f"Error loading data: {e}")
         print(f"Please ensure '{data_filename}' exists. It should have been generated by this script.")
@@ -101,92 +225,235 @@ def analyze_big_data(data_filename=DATA_FILENAME, report_filename=ANALYSIS_REPOR
     # --- 4. Perform Analysis and Derive Insights ---
     print("\n--- Performing Big Data Analysis ---")
 
+    # All five insights share one scan and one shuffle via GROUPING SETS;
+    # GROUPING_ID tells the per-insight rows apart afterwards.
+    df_spark.createOrReplaceTempView("transactions")
+    insights = spark.sql("""
+        SELECT Region, ProductCategory, PaymentMethod, CustomerID, YearMonth,
+               SUM(TotalAmount) AS TotalSales,
+               SUM(Profit) AS TotalProfit,
+               AVG(TotalAmount) AS AverageTransactionValue,
+               COUNT(TransactionID) AS NumberOfTransactions,
+               GROUPING_ID(Region, ProductCategory, PaymentMethod, CustomerID, YearMonth) AS GroupingID
+        FROM transactions
+        GROUP BY GROUPING SETS ((Region), (ProductCategory), (PaymentMethod), (CustomerID), (YearMonth))
+    """).persist(StorageLevel.MEMORY_AND_DISK)
+    # GROUPING_ID sets a bit for every column *not* in the grouping set (first column = highest bit)
+    grouping_id = {name: 0b11111 ^ (1 << (4 - i)) for i, name in
+                   enumerate(["Region", "ProductCategory", "PaymentMethod", "CustomerID", "YearMonth"])}
+
     # Insight 1: Total Sales and Profit by Region
     print("\nInsight 1: Total Sales and Profit by Region")
-    sales_by_region = df_spark.groupBy("Region").agg(
-        sum("TotalAmount").alias("TotalSales"),
-        sum("Profit").alias("TotalProfit")
-    ).orderBy(col("TotalSales").desc())
-    sales_by_region.show()
+    sales_by_region = insights.filter(col("GroupingID") == grouping_id["Region"]) \
+        .select("Region", "TotalSales", "TotalProfit") \
+        .orderBy(col("TotalSales").desc())
+    sales_by_region_pd = sales_by_region.toPandas() # Aggregated results are tiny; collect each once
+    print(sales_by_region_pd.to_string(index=False, float_format=_MONEY_FORMAT))
 
     # Insight 2: Top 5 Product Categories by Sales
     print("\nInsight 2: Top 5 Product Categories by Sales")
-    top_products = df_spark.groupBy("ProductCategory").agg(
-        sum("TotalAmount").alias("TotalSales")
-    ).orderBy(col("TotalSales").desc()).limit(5)
-    top_products.show()
+    top_products = insights.filter(col("GroupingID") == grouping_id["ProductCategory"]) \
+        .select("ProductCategory", "TotalSales") \
+        .orderBy(col("TotalSales").desc()).limit(5)
+    top_products_pd = top_products.toPandas()
+    print(top_products_pd.to_string(index=False, float_format=_MONEY_FORMAT))
 
     # Insight 3: Monthly Sales Trend
     print("\nInsight 3: Monthly Sales Trend")
-    monthly_sales = df_spark.withColumn("YearMonth", date_format(col("Date"), "yyyy-MM")) \
-        .groupBy("YearMonth").agg(
-            sum("TotalAmount").alias("MonthlySales")
-        ).orderBy("YearMonth")
-    monthly_sales.show(50) # Show more months if available
+    monthly_sales = insights.filter(col("GroupingID") == grouping_id["YearMonth"]) \
+        .orderBy("YearMonth") \
+        .select(
+            format_string("%04d-%02d", (col("YearMonth") / 12).cast("int") + 1970, col("YearMonth") % 12 + 1).alias("YearMonth"),
+            col("TotalSales").alias("MonthlySales")
+        )
+    monthly_sales_pd = monthly_sales.toPandas()
+    print(monthly_sales_pd.head(50).to_string(index=False, float_format=_MONEY_FORMAT)) # Show more months if available
 
     # Insight 4: Average Transaction Value by Payment Method
     print("\nInsight 4: Average Transaction Value by Payment Method")
-    avg_transaction_value = df_spark.groupBy("PaymentMethod").agg(
-        avg("TotalAmount").alias("AverageTransactionValue"),
-        count("TransactionID").alias("NumberOfTransactions")
-    ).orderBy(col("NumberOfTransactions").desc())
-    avg_transaction_value.show()
+    avg_transaction_value = insights.filter(col("GroupingID") == grouping_id["PaymentMethod"]) \
+        .select("PaymentMethod", "AverageTransactionValue", "NumberOfTransactions") \
+        .orderBy(col("NumberOfTransactions").desc())
+    avg_transaction_value_pd = avg_transaction_value.toPandas()
+    print(avg_transaction_value_pd.to_string(index=False, float_format=_MONEY_FORMAT))
 
     # Insight 5: Number of Transactions per Customer (top 10 customers)
+    # CustomerID is partially aggregated map-side inside the grouping-set job, and orderBy + limit
+    # is planned as TakeOrderedAndProject (a bounded top-10 heap per partition, then a merge),
+    # so the ~90k customer groups are never fully sorted.
     print("\nInsight 5: Top 10 Customers by Number of Transactions")
-    top_customers = df_spark.groupBy("CustomerID").agg(
-        count("TransactionID").alias("NumberOfTransactions"),
-        sum("TotalAmount").alias("TotalSpent")
-    ).orderBy(col("NumberOfTransactions").desc()).limit(10)
-    top_customers.show()
+    top_customers = insights.filter(col("GroupingID") == grouping_id["CustomerID"]) \
+        .select("CustomerID", "NumberOfTransactions", col("TotalSales").alias("TotalSpent")) \
+        .orderBy(col("NumberOfTransactions").desc()).limit(10)
+    top_customers_pd = top_customers.toPandas()
+    print(top_customers_pd.to_string(index=False, float_format=_MONEY_FORMAT))
 
 
     # --- 5. Save Insights to a Report File ---
+    save_report(report_filename, sales_by_region_pd, top_products_pd, monthly_sales_pd,
+                avg_transaction_value_pd, top_customers_pd)
+
+    # --- 6. Stop Spark Session ---
+    print("\n--- Stopping Spark Session ---")
+    insights.unpersist()
+    if VERBOSE:
+        df_spark.unpersist()
+    spark.stop()
+    print("Spark Session stopped.")
+    print("\n--- Big Data Analysis Project Complete! ---")
+
+# --- Function 3: Perform the Same Analysis on a Single Node with DuckDB or Polars ---
+def analyze_single_node(data_filename=DATA_FILENAME, report_filename=ANALYSIS_REPORT_FILENAME, backend=BACKEND):
+    """
+    Performs the same analysis as `analyze_big_data` in a single process with DuckDB or Polars,
+    avoiding JVM startup and shuffle overhead for datasets that fit on one machine.
+
+    Args:
+        data_filename (str): The Parquet dataset directory (or a CSV file) to analyze.
+        report_filename (str): The name of the report file to save the insights to.
+        backend (str): Either "duckdb" or "polars".
+    """
+    single_node_backends = [name for name in SUPPORTED_BACKENDS if name != "spark"]
+    if backend not in single_node_backends:
+        raise ValueError(f"Unknown single-node backend '{backend}'. Expected one of: {', '.join(single_node_backends)}.")
+
+    print(f"\n--- Performing Big Data Analysis with {backend} ---")
+    if backend == "duckdb":
+        import duckdb
+
+        con = duckdb.connect()
+        # The relational API takes the path as a value, so it never has to be quoted into SQL
+        if data_filename.endswith('.csv'):
+            con.read_csv(data_filename, header=True, date_format='%Y-%m-%d') \
+                .project("*, ((year(Date) - 1970) * 12 + month(Date) - 1)::INTEGER AS YearMonth") \
+                .create_view("transactions")
+        else:
+            con.read_parquet(os.path.join(data_filename, '**', '*.parquet'), hive_partitioning=True) \
+                .create_view("transactions")
+        sales_by_region_pd = con.execute("""
+            SELECT Region, SUM(TotalAmount) AS TotalSales, SUM(Profit) AS TotalProfit
+            FROM transactions GROUP BY Region ORDER BY TotalSales DESC
+        """).fetchdf()
+        top_products_pd = con.execute("""
+            SELECT ProductCategory, SUM(TotalAmount) AS TotalSales
+            FROM transactions GROUP BY ProductCategory ORDER BY TotalSales DESC LIMIT 5
+        """).fetchdf()
+        monthly_sales_pd = con.execute("""
+            SELECT printf('%04d-%02d', YearMonth // 12 + 1970, YearMonth % 12 + 1) AS YearMonth, MonthlySales
+            FROM (SELECT YearMonth, SUM(TotalAmount) AS MonthlySales FROM transactions GROUP BY YearMonth)
+            ORDER BY 1
+        """).fetchdf()
+        avg_transaction_value_pd = con.execute("""
+            SELECT PaymentMethod, AVG(TotalAmount) AS AverageTransactionValue, COUNT(TransactionID) AS NumberOfTransactions
+            FROM transactions GROUP BY PaymentMethod ORDER BY NumberOfTransactions DESC
+        """).fetchdf()
+        top_customers_pd = con.execute("""
+            SELECT CustomerID, COUNT(TransactionID) AS NumberOfTransactions, SUM(TotalAmount) AS TotalSpent
+            FROM transactions GROUP BY CustomerID ORDER BY NumberOfTransactions DESC LIMIT 10
+        """).fetchdf()
+        con.close()
+    else:
+        import polars as pl
+
+        if data_filename.endswith('.csv'):
+            transactions = pl.scan_csv(data_filename, try_parse_dates=True).with_columns(
+                ((pl.col("Date").dt.year() - 1970) * 12 + pl.col("Date").dt.month() - 1).cast(pl.Int32).alias("YearMonth")
+            )
+        else:
+            transactions = pl.scan_parquet(os.path.join(data_filename, '**', '*.parquet'), hive_partitioning=True)
+        queries = [
+            transactions.group_by("Region").agg(
+                pl.col("TotalAmount").sum().alias("TotalSales"),
+                pl.col("Profit").sum().alias("TotalProfit")
+            ).sort("TotalSales", descending=True),
+            transactions.group_by("ProductCategory").agg(
+                pl.col("TotalAmount").sum().alias("TotalSales")
+            ).sort("TotalSales", descending=True).head(5),
+            transactions.group_by("YearMonth").agg(
+                pl.col("TotalAmount").sum().alias("MonthlySales")
+            ).sort("YearMonth").with_columns(
+                pl.format("{}-{}", pl.col("YearMonth") // 12 + 1970,
+                          (pl.col("YearMonth") % 12 + 1).cast(pl.String).str.zfill(2)).alias("YearMonth")
+            ),
+            transactions.group_by("PaymentMethod").agg(
+                pl.col("TotalAmount").mean().alias("AverageTransactionValue"),
+                pl.col("TransactionID").count().alias("NumberOfTransactions")
+            ).sort("NumberOfTransactions", descending=True),
+            transactions.group_by("CustomerID").agg(
+                pl.col("TransactionID").count().alias("NumberOfTransactions"),
+                pl.col("TotalAmount").sum().alias("TotalSpent")
+            ).sort("NumberOfTransactions", descending=True).head(10),
+        ]
+        # collect_all optimizes the five queries together, so the shared scan runs once
+        sales_by_region_pd, top_products_pd, monthly_sales_pd, avg_transaction_value_pd, top_customers_pd = \
+            [result.to_pandas() for result in pl.collect_all(queries)]
+
+    print("\nInsight 1: Total Sales and Profit by Region")
+    print(sales_by_region_pd.to_string(index=False, float_format=_MONEY_FORMAT))
+    print("\nInsight 2: Top 5 Product Categories by Sales")
+    print(top_products_pd.to_string(index=False, float_format=_MONEY_FORMAT))
+    print("\nInsight 3: Monthly Sales Trend")
+    print(monthly_sales_pd.head(50).to_string(index=False, float_format=_MONEY_FORMAT))
+    print("\nInsight 4: Average Transaction Value by Payment Method")
+    print(avg_transaction_value_pd.to_string(index=False, float_format=_MONEY_FORMAT))
+    print("\nInsight 5: Top 10 Customers by Number of Transactions")
+    print(top_customers_pd.to_string(index=False, float_format=_MONEY_FORMAT))
+
+    save_report(report_filename, sales_by_region_pd, top_products_pd, monthly_sales_pd,
+                avg_transaction_value_pd, top_customers_pd)
+    print("\n--- Big Data Analysis Project Complete! ---")
+
+# --- Function 4: Save Insights to a Report File ---
+def save_report(report_filename, sales_by_region_pd, top_products_pd, monthly_sales_pd,
+                avg_transaction_value_pd, top_customers_pd):
+    """
+    Writes the five collected insight tables (pandas DataFrames) to the report file as HTML tables.
+    """
     print(f"\n--- Saving Analysis Report to '{report_filename}' ---")
     with open(report_filename, 'w') as f:
         f.write("--- Big Data Analysis Report ---\n\n")
 
         f.write("Insight 1: Total Sales and Profit by Region\n")
-        # Convert Spark DataFrame to HTML table string for better readability in text file
+        # Convert the collected results to HTML table strings for better readability in text file
         # This is a workaround to get a somewhat formatted table in a plain text file.
         # For true HTML output, you'd save to an .html file or use a dedicated reporting tool.
-        sales_by_region_html = sales_by_region._repr_html_()
-        f.write(sales_by_region_html.replace('<table', '<table border="1"').replace('<th>', '<th style="padding: 5px;">').replace('<td>', '<td style="padding: 5px;">'))
+        sales_by_region_html = sales_by_region_pd.to_html(border=1, index=False, float_format=_MONEY_FORMAT)
+        f.write(_HTML_CELL.sub(_HTML_CELL_PADDED, sales_by_region_html))
         f.write("\n\n")
 
         f.write("Insight 2: Top 5 Product Categories by Sales\n")
-        top_products_html = top_products._repr_html_()
-        f.write(top_products_html.replace('<table', '<table border="1"').replace('<th>', '<th style="padding: 5px;">').replace('<td>', '<td style="padding: 5px;">'))
+        top_products_html = top_products_pd.to_html(border=1, index=False, float_format=_MONEY_FORMAT)
+        f.write(_HTML_CELL.sub(_HTML_CELL_PADDED, top_products_html))
         f.write("\n\n")
 
         f.write("Insight 3: Monthly Sales Trend (First 50 Months)\n")
-        monthly_sales_html = monthly_sales._repr_html_()
-        f.write(monthly_sales_html.replace('<table', '<table border="1"').replace('<th>', '<th style="padding: 5px;">').replace('<td>', '<td style="padding: 5px;">'))
+        monthly_sales_html = monthly_sales_pd.head(50).to_html(border=1, index=False, float_format=_MONEY_FORMAT)
+        f.write(_HTML_CELL.sub(_HTML_CELL_PADDED, monthly_sales_html))
         f.write("\n\n")
 
         f.write("Insight 4: Average Transaction Value by Payment Method\n")
-        avg_transaction_value_html = avg_transaction_value._repr_html_()
-        f.write(avg_transaction_value_html.replace('<table', '<table border="1"').replace('<th>', '<th style="padding: 5px;">').replace('<td>', '<td style="padding: 5px;">'))
+        avg_transaction_value_html = avg_transaction_value_pd.to_html(border=1, index=False, float_format=_MONEY_FORMAT)
+        f.write(_HTML_CELL.sub(_HTML_CELL_PADDED, avg_transaction_value_html))
         f.write("\n\n")
 
         f.write("Insight 5: Top 10 Customers by Number of Transactions\n")
-        top_customers_html = top_customers._repr_html_()
-        f.write(top_customers_html.replace('<table', '<table border="1"').replace('<th>', '<th style="padding: 5px;">').replace('<td>', '<td style="padding: 5px;">'))
+        top_customers_html = top_customers_pd.to_html(border=1, index=False, float_format=_MONEY_FORMAT)
+        f.write(_HTML_CELL.sub(_HTML_CELL_PADDED, top_customers_html))
         f.write("\n\n")
 
         f.write("\n--- End of Report ---\n")
 
     print("Analysis report saved successfully.")
 
-    # --- 6. Stop Spark Session ---
-    print("\n--- Stopping Spark Session ---")
-    spark.stop()
-    print("Spark Session stopped.")
-    print("\n--- Big Data Analysis Project Complete! ---")
-
 # --- Main execution block ---
 if __name__ == "__main__":
+    # Check the backend up front, before spending time generating the data
+    if BACKEND not in SUPPORTED_BACKENDS:
+        raise ValueError(f"Unknown BACKEND '{BACKEND}'. Expected one of: {', '.join(SUPPORTED_BACKENDS)}.")
     # First, generate the data
     generate_large_data()
     # Then, analyze the generated data
-    analyze_big_data()
+    if BACKEND == "spark":
+        analyze_big_data()
+    else:
+        analyze_single_node()